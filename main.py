@@ -1,26 +1,38 @@
 import gym_line_follower
 import gymnasium as gym
-from wrappers import RenderRerun
+from wrappers import RenderRerunVector
+
+
+NUM_ENVS = 4
+# "async" runs each environment in a subprocess, so the PyBullet simulations step in parallel and outside of the
+# process that logs to Rerun. "sync" steps the environments one after the other in this process.
+VECTORIZATION_MODE = "async"
 
 
 def main():
-    env = gym.make('LineFollower-v0', gui = False, render_mode = 'rgb_array', randomize=False)
-    env = RenderRerun(env, filename="gym-line-follower.rrd", skip_episodes=3, viewer="script")
-    
-    for j in range(5):
-        env.reset(seed=123)
+    envs = gym.make_vec(
+        'LineFollower-v0',
+        num_envs=NUM_ENVS,
+        vectorization_mode=VECTORIZATION_MODE,
+        # The subprocesses write their observations to shared memory instead of sending them through the pipes.
+        vector_kwargs={"shared_memory": True} if VECTORIZATION_MODE == "async" else None,
+        gui=False,
+        render_mode='rgb_array',
+        randomize=False,
+    )
+    envs = RenderRerunVector(envs, filename="gym-line-follower.rrd", skip_episodes=3, viewer="script")
+
+    # Each environment resets itself when its episode ends, so the 2500 steps of the vector environment are
+    # 2500 steps of every environment, however many episodes that takes.
+    envs.reset(seed=123)
 
-        for i in range(500):
-            action = env.action_space.sample()
-            obsv, reward, done, truncated, info = env.step(action)
-            
-            if done:
-                break
+    for i in range(2500):
+        envs.step(envs.action_space.sample())
 
-    print("Done: ", done)
+    print("Episodes: ", envs.episodes)
 
     #close the environment
-    env.close()
+    envs.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+"""Checks the RerunRecording helpers shared by RenderRerun and RenderRerunVector."""
+
+
+import gc
+import queue
+import time
+
+import numpy as np
+import pytest
+
+import gymnasium as gym
+import rerun as rr
+
+from wrappers import RenderRerun
+from wrappers.recording import FLUSH_FRAMES, FRAME_BATCH_TIMEOUT, cv2, format_action, planar_image
+
+
+class ImageEnv(gym.Env):
+    """Never terminates, renders a black frame of the given shape and dtype."""
+
+    metadata = {"render_modes": ["rgb_array"]}
+
+    def __init__(self, shape=(4, 4, 3), dtype=np.uint8, render_mode: str = "rgb_array"):
+        self.shape = shape
+        self.dtype = dtype
+        self.render_mode = render_mode
+        self.observation_space = gym.spaces.Discrete(1)
+        self.action_space = gym.spaces.Discrete(2)
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        return 0, {}
+
+    def step(self, action):
+        return 0, 0.0, False, False, {}
+
+    def render(self):
+        return np.zeros(self.shape, dtype=self.dtype)
+
+
+def test_unclosed_wrapper_is_collected():
+    env = RenderRerun(ImageEnv(), skip_episodes=0)
+    env.reset()
+    env.step(0)
+    thread = env._encoder_thread
+    del env
+
+    gc.collect()
+    thread.join(timeout=FRAME_BATCH_TIMEOUT * 4)
+    assert not thread.is_alive()
+
+
+def test_format_action_keeps_equal_actions_apart():
+    # True == 1.0 and (True, 2) == (1.0, 2), each action is still formatted as its own type.
+    assert format_action(True) == "True"
+    assert format_action(1.0) == "1"
+    assert format_action((True, 2)) == "(True, 2)"
+    assert format_action((1.0, 2)) == "(1, 2)"
+    assert format_action({"a": True}) == "{a: True}"
+    assert format_action({"a": 1.0}) == "{a: 1}"
+
+
+def test_format_action_arrays():
+    assert format_action(np.array([0.5, 0.25])) == "[0.5, 0.25]"
+    assert format_action(np.array([1, 2])) == "[1, 2]"
+    assert format_action((np.array([0.5, -1.0]), 2)) == "([0.5, -1], 2)"
+
+
+def test_compress_jpeg():
+    env = RenderRerun(ImageEnv(), skip_episodes=0, jpeg_quality=90)
+
+    encoded = env.compress(np.zeros((4, 4, 3), dtype=np.uint8))
+    assert isinstance(encoded, bytes) and encoded.startswith(b"\xff\xd8")
+
+    # Frames that aren't RGB uint8 aren't JPEG compressed.
+    buffer, image_format = env.compress(np.zeros((4, 4, 3), dtype=np.float32))
+    assert buffer.dtype == np.float32
+    assert image_format.channel_datatype == rr.datatypes.ChannelDatatype.F32
+    env.close()
+
+
+@pytest.mark.skipif(cv2 is None, reason="OpenCV isn't installed")
+def test_planar_image():
+    frame = np.zeros((4, 6, 3), dtype=np.uint8)
+    out = np.empty((6, 6), dtype=np.uint8)
+
+    yuv, image_format = planar_image(frame, out)
+    assert yuv.shape == (6, 6)
+    assert np.shares_memory(yuv, out)
+    assert (image_format.width, image_format.height) == (6, 4)
+    assert image_format.pixel_format == rr.PixelFormat.Y_U_V12_LimitedRange
+
+    # Odd sizes can't be subsampled, they're logged as they are.
+    odd = np.zeros((3, 5, 3), dtype=np.uint8)
+    buffer, image_format = planar_image(odd)
+    assert buffer is odd
+    assert image_format.color_model == rr.datatypes.ColorModel.RGB
+
+
+def test_dropped_frames_are_counted():
+    env = RenderRerun(ImageEnv(), skip_episodes=0, max_queued_frames=2)
+    env.reset()
+    paths = env._paths
+
+    # A queue the encoder thread doesn't read, so nothing is taken out while it's filled.
+    encoder_queue, env._frame_queue = env._frame_queue, queue.Queue(maxsize=2)
+    warnings = []
+    env.log_warning = lambda path, frame_idx, text: warnings.append((path, frame_idx))
+    env._dropped_reported = time.monotonic()
+
+    for frame_idx in range(4):
+        env.queue_frame((paths, frame_idx, np.zeros((4, 4, 3), dtype=np.uint8)))
+    assert (env._dropped, env._dropped_frame) == (2, 1)
+
+    # The end of episode marker replaces a frame, but a dropped marker isn't counted as a frame.
+    env._put_frame_queue(FLUSH_FRAMES)
+    env.queue_frame((paths, 4, np.zeros((4, 4, 3), dtype=np.uint8)))
+    env.queue_frame((paths, 5, np.zeros((4, 4, 3), dtype=np.uint8)))
+    assert (env._dropped, env._dropped_frame) == (4, 3)
+
+    env.report_dropped()
+    assert warnings == [(paths["warnings"], 3)]
+    assert env._dropped == 0
+
+    env._frame_queue = encoder_queue
+    env.close()
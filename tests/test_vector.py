@@ -0,0 +1,110 @@
+"""Checks the per sub-environment episode bookkeeping of RenderRerunVector with both autoreset modes."""
+
+
+import numpy as np
+import pytest
+
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode, SyncVectorEnv
+
+from wrappers import RenderRerunVector
+
+
+class CountingEnv(gym.Env):
+    """Terminates after ``length`` steps, the reward is the step number of the episode."""
+
+    metadata = {"render_modes": ["rgb_array"]}
+
+    def __init__(self, length: int, render_mode: str = "rgb_array"):
+        self.length = length
+        self.render_mode = render_mode
+        self.observation_space = gym.spaces.Discrete(10)
+        self.action_space = gym.spaces.Discrete(2)
+        self.t = 0
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        self.t = 0
+        return self.t, {}
+
+    def step(self, action):
+        self.t += 1
+        return self.t, float(self.t), self.t >= self.length, False, {}
+
+    def render(self):
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def record(autoreset_mode: AutoresetMode, steps: int):
+    """Steps sub-environments of length 2 and 3, returns the episodes and the logged (frame, reward) rows per episode."""
+    envs = SyncVectorEnv([lambda: CountingEnv(2), lambda: CountingEnv(3)], autoreset_mode=autoreset_mode)
+    envs = RenderRerunVector(envs, skip_episodes=0)
+
+    rows: dict[str, list[tuple[int, float]]] = {}
+    frames: dict[str, list[int]] = {}
+    send_rows, queue_frame = envs.send_rows, envs.queue_frame
+
+    def capture_rows(paths, batch):
+        if batch:
+            rows.setdefault(paths["episode"], []).extend((frame, reward) for frame, reward, _ in batch)
+        send_rows(paths, batch)
+
+    def capture_frame(item):
+        frames.setdefault(item[0]["episode"], []).append(item[1])
+        queue_frame(item)
+
+    envs.send_rows, envs.queue_frame = capture_rows, capture_frame
+
+    envs.reset(seed=123)
+    for _ in range(steps):
+        envs.step(envs.action_space.sample())
+
+    episodes = list(envs.episodes)
+    envs.close()
+    return episodes, rows, frames
+
+
+def test_next_step_autoreset():
+    episodes, rows, frames = record(AutoresetMode.NEXT_STEP, 7)
+
+    # The step after the end of an episode only resets the sub-environment and isn't logged.
+    assert episodes == [3, 2]
+    assert rows == {
+        "env0/episode00001": [(0, 1.0), (1, 2.0)],
+        "env0/episode00002": [(0, 1.0), (1, 2.0)],
+        "env0/episode00003": [(0, 1.0)],
+        "env1/episode00001": [(0, 1.0), (1, 2.0), (2, 3.0)],
+        "env1/episode00002": [(0, 1.0), (1, 2.0), (2, 3.0)],
+    }
+    assert frames == {episode: [frame for frame, _ in logged] for episode, logged in rows.items()}
+
+
+def test_same_step_autoreset():
+    episodes, rows, frames = record(AutoresetMode.SAME_STEP, 7)
+
+    # The last step of an episode is logged, and the next step already belongs to the next episode.
+    assert episodes == [4, 3]
+    assert rows == {
+        "env0/episode00001": [(0, 1.0), (1, 2.0)],
+        "env0/episode00002": [(0, 1.0), (1, 2.0)],
+        "env0/episode00003": [(0, 1.0), (1, 2.0)],
+        "env0/episode00004": [(0, 1.0)],
+        "env1/episode00001": [(0, 1.0), (1, 2.0), (2, 3.0)],
+        "env1/episode00002": [(0, 1.0), (1, 2.0), (2, 3.0)],
+        "env1/episode00003": [(0, 1.0)],
+    }
+    assert frames == {episode: [frame for frame, _ in logged] for episode, logged in rows.items()}
+
+
+@pytest.mark.parametrize("autoreset_mode", [AutoresetMode.NEXT_STEP, AutoresetMode.SAME_STEP])
+def test_reset_mask(autoreset_mode: AutoresetMode):
+    envs = SyncVectorEnv([lambda: CountingEnv(5), lambda: CountingEnv(5)], autoreset_mode=autoreset_mode)
+    envs = RenderRerunVector(envs, skip_episodes=0)
+
+    envs.reset(seed=123)
+    envs.step(envs.action_space.sample())
+    envs.reset(options={"reset_mask": np.array([True, False])})
+
+    assert envs.episodes == [2, 1]
+    assert envs.frames == [0, 1]
+    envs.close()
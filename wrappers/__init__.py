@@ -1,20 +1,24 @@
 """An alternative to gymnasium.wrappers.RenderCollection that records each step to a Rerun recording.
 
 * ``RenderRerun`` - Collects rendered frames into Rerun
+* ``RenderRerunVector`` - Collects rendered frames of every sub-environment of a vector environment into Rerun
 """
 
 
-from copy import deepcopy
 from typing import Any, Generic, SupportsFloat, Literal
 
+import numpy as np
+
 import gymnasium as gym
 from gymnasium.core import ActType, ObsType, RenderFrame
 
-import rerun as rr, rerun.blueprint as rrb
+from wrappers.recording import RerunRecording, episode_paths
+from wrappers.vector import RenderRerunVector
 
 
 __all__ = [
     "RenderRerun",
+    "RenderRerunVector",
 ]
 
 
@@ -22,6 +26,7 @@ class RenderRerun(
     gym.Wrapper[ObsType, ActType, ObsType, ActType],
     Generic[ObsType, ActType, RenderFrame],
     gym.utils.RecordConstructorArgs,
+    RerunRecording,
 ):
     """Collect rendered frames of an environment such each ``step`` is saved to Rerun.
 
@@ -50,13 +55,23 @@ class RenderRerun(
 
     """
 
+    # Slots for the attributes used on every step, gym.Wrapper still provides a __dict__ for the rest.
+    __slots__ = (
+        "_step", "_reset", "_render", "episode", "frame", "_paths", "image_every", "_batch",
+    )
 
     def __init__(
         self,
         env: gym.Env[ObsType, ActType],
         filename: str | None = None,
         skip_episodes: int = 100,
-        viewer: Literal["script", "notebook", False] = False
+        viewer: Literal["script", "notebook", False] | None = False,
+        flush_every: int = 64,
+        image_every: int = 1,
+        max_queued_frames: int = 32,
+        batch_size: int = 32,
+        jpeg_quality: int | None = 95,
+        memory_limit: str = "75%",
     ):
         """Initialize a :class:`RenderRerun` instance.
 
@@ -64,36 +79,40 @@ class RenderRerun(
             env: The environment that is being wrapped
             filename (str): Optional to save the recording to a file.
             skip_episodes (int): 0 or 1 save all episodes, otherwise skip episodes to reduce file size. Default 100 means episodes 1, 101, 201, ... are saved.
-            viewer (str or False): Default False. Other options "script" or "notebook" should be chosen based on respective code execution method.
+            viewer (str, False or None): Default False, None also means no viewer. Other options "script" or "notebook" should be chosen based on respective code execution method.
+            flush_every (int): Number of logged steps between flushes of the recording streams. Streams are also flushed when an episode ends and on close. Default 64.
+            image_every (int): Render and log a frame every ``image_every`` steps of a saved episode, reward and action are still logged every step. Default 1.
+            max_queued_frames (int): Frames waiting to be compressed in the background, when full the oldest frame is dropped. Default 32.
+            batch_size (int): Number of steps of reward and action sent to Rerun in a single columnar batch. Default 32.
+            jpeg_quality (int or None): Quality of the JPEG compressed frames. None logs the frames uncompressed, as planar YUV 4:2:0 if OpenCV is installed. Default 95.
+            memory_limit (str): Memory limit of the spawned native viewer, e.g. "512MB", it drops the oldest data when reached. Default "75%" of the RAM.
         """
         gym.Wrapper.__init__(self, env)
 
-        assert env.render_mode is not None
-        assert not env.render_mode.endswith("_list")
+        # gym.Wrapper only delegates these to the wrapped environment, so they're bound once instead of going through super().
+        self._step = env.step
+        self._reset = env.reset
+        self._render = env.render
 
         self.episode = 0
         self.frame = 0
-        self.skip_episodes = skip_episodes
-        self.viewer = viewer
-
-        # Store any active RecordingStream instances in a list and iterate over it.
-        self.recs: list[rr.RecordingStream] = []
-
-        self.file_rec: rr.RecordingStream | None = None
-        if filename:
-            self.file_rec = rr.RecordingStream(application_id="rerun_wrapper_file")
-            self.file_rec.save(filename)
-            self.recs.append(self.file_rec)
-
-        # Create a viewer recording stream only; do not auto-spawn — spawn when render() is called.
-        self.viewer_rec = rr.RecordingStream(application_id="rerun_wrapper_viewer")
-        if self.viewer:
-            self.render()
+        self.set_paths()
+        self.image_every = max(image_every, 1)
+        self._batch: list[tuple[int, float, np.ndarray | str]] = []
+
+        self.start_recording(
+            render_mode=env.render_mode,
+            filename=filename,
+            viewer=viewer,
+            skip_episodes=skip_episodes,
+            flush_every=flush_every,
+            max_queued_frames=max_queued_frames,
+            batch_size=batch_size,
+            action_space=env.action_space,
+            jpeg_quality=jpeg_quality,
+            memory_limit=memory_limit,
+        )
 
-        self.recs.append(self.viewer_rec)
-        
-        self.start_blueprint()
-        
 
     @property
     def render_mode(self):
@@ -105,11 +124,13 @@ class RenderRerun(
         self, action: ActType
     ) -> tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]]:
         """Perform a step in the base environment and collect a frame."""
-        output = super().step(action)
+        output = self._step(action)
+
+        # Skipped episodes never reach the logger, so the frame is neither rendered nor compressed.
+        if self._log_all or self.episode % self.skip_episodes == 1:
+            frame = self._render() if self.frame % self.image_every == 0 else None
+            self.logger(output, action, frame)
 
-        if (self.skip_episodes in [0, 1]) or (self.episode % self.skip_episodes == 1):
-            self.logger(output, action)
-        
         self.frame += 1
         return output
 
@@ -118,109 +139,69 @@ class RenderRerun(
         self, *, seed: int | None = None, options: dict[str, Any] | None = None
     ) -> tuple[ObsType, dict[str, Any]]:
         """Reset the base environment, move to next episode and reset frames."""
-        output = super().reset(seed=seed, options=options)
+        output = self._reset(seed=seed, options=options)
+
+        # The batch belongs to the previous episode's entity paths.
+        self.send_batch()
 
         self.episode += 1
         self.frame = 0
+        self.set_paths()
 
-        if self.file_rec:
-            self.file_rec.flush()
+        # The blueprint only changes when a new episode is going to be logged.
+        if self.is_logged(self.episode):
+            self.update_blueprint(self._paths["episode"])
+            self.send_blueprint()
 
         return output
 
 
+    def set_paths(self) -> None:
+        """Builds the entity paths of the current episode, so they're not formatted on every step."""
+        self._paths = episode_paths(f"episode{self.episode:05}")
+
+
     def render(self) -> None:
         """Displays the Rerun viewer in a Jupyter Notebook."""
-        # kept for compatibility, delegate to viewer recording stream if present
-        if self.viewer_rec:
-            if self.viewer == "script":
-                self.viewer_rec.spawn()
-            elif self.viewer == "notebook":
-                self.viewer_rec.notebook_show()
+        self.show_viewer()
 
         return None
 
 
-    def logger(self, output: tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]], action: ActType) -> None:
-        """Logs the data to Rerun."""
-        episode_name = f"episode{self.episode:05}"
+    def logger(
+        self,
+        output: tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]],
+        action: ActType,
+        frame: RenderFrame | None = None,
+    ) -> None:
+        """Logs the data to Rerun, the rendered ``frame`` is only logged when given."""
+        paths = self._paths
 
         # output = (obsv, reward, done, truncated, info)
-        reward = rr.TextLog(str(output[1]))
         done = output[2]
-        rr_done = rr.TextLog("DONE!")
         truncated = output[3]
-        rr_truncated = rr.TextLog("Interrupted")
-        action = rr.TextLog(str(action))
-        image = rr.Image(super().render()).compress(jpeg_quality=95)
-        for s in self.recs:
-            s.set_time("frame", sequence=self.frame)
-
-            s.log(f"{episode_name}/reward", reward)
-
-            if done:
-                s.log(f"{episode_name}/done", rr_done)
-
-            if truncated:
-                s.log(f"{episode_name}/interrupted", rr_truncated)
-
-            s.log(f"{episode_name}/action", action)
-            s.log(f"{episode_name}/frames", image)
-
-            self.update_blueprint(episode_name)
-
-
-    def start_blueprint(self):
-        self.episode_names = set()
-        self.tabs = []
-
-
-    def update_blueprint(self, episode_name):
-        if episode_name not in self.episode_names:
-            self.episode_names.add(episode_name)
-            self.tabs.append(
-                rrb.Horizontal(
-                            contents= [
-                                rrb.Spatial2DView(
-                                    name="frames",
-                                    origin=f"/{episode_name}/frames"
-                                )
-                            ] + 
-                            [
-                                rrb.Vertical(contents=[
-                                    rrb.TextLogView(
-                                        name=name,
-                                        origin=f"/{episode_name}/{name}")
-                                        for name in ["action", "reward"]
-
-                                ])
-                            ],
-                            name=episode_name,
-                        )
-            )
-            
-            blueprint = rrb.Blueprint(
-                rrb.Tabs(
-                    contents=self.tabs
-                ),
-                rrb.BlueprintPanel(state="collapsed"),
-                rrb.SelectionPanel(state="collapsed"),
-                rrb.TimePanel(state="expanded"),
-            )
-
-            for s in self.recs:
-                s.send_blueprint(blueprint)
+        self._batch.append((self.frame, float(output[1]), self.action_row(action)))
+
+        if done or truncated:
+            self.log_markers(paths, self.frame, done, truncated)
+
+        if frame is not None:
+            self.queue_frame((paths, self.frame, frame))
+
+        if done or truncated or len(self._batch) >= self.batch_size:
+            self.send_batch()
+
+        self.count_logged(done or truncated)
+
 
+    def send_batch(self) -> None:
+        """Sends the batched rewards and actions as columns, one call per entity path."""
+        self.send_rows(self._paths, self._batch)
 
 
     def close(self):
         """Disconnects Rerun and closes the wrapped environment."""
-        # Disconnect all recording streams
-        for s in self.recs:
-            try:
-                s.disconnect()
-            except Exception:
-                pass
+        self.stop_recording()
 
         return super().close()
 
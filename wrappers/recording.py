@@ -0,0 +1,572 @@
+"""Rerun recording shared by the single and vector environment wrappers.
+
+* ``RerunRecording`` - Owns the recording streams, the frame encoder thread and the blueprint
+"""
+
+
+from abc import ABC, abstractmethod
+import atexit
+from functools import partial
+from io import BytesIO
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Literal
+
+import numpy as np
+
+from gymnasium import spaces
+from gymnasium.core import RenderFrame
+
+from PIL import Image as PILImage
+import rerun as rr, rerun.blueprint as rrb
+
+try:
+    from turbojpeg import TJPF_RGB, TJSAMP_420, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+__all__ = [
+    "RerunRecording",
+    "NUMERIC_ACTION_SPACES",
+    "episode_paths",
+    "format_action",
+    "load_turbojpeg",
+    "planar_image",
+    "raw_image",
+]
+
+
+# Actions of these spaces are logged as scalars, any other action is logged as text.
+NUMERIC_ACTION_SPACES = (spaces.Box, spaces.Discrete, spaces.MultiDiscrete, spaces.MultiBinary)
+
+# Minimum seconds between two warnings about frames dropped from the full frame queue.
+DROPPED_REPORT_INTERVAL = 1.0
+
+# Seconds the encoder thread waits for another frame before sending the frames it already compressed.
+FRAME_BATCH_TIMEOUT = 0.5
+
+# Queued after the last frame of an episode, so the encoder thread sends the frames it has pending.
+FLUSH_FRAMES = "flush"
+
+# A compressed frame is either JPEG bytes, or an uncompressed buffer with its image format.
+EncodedFrame = bytes | tuple[np.ndarray, rr.components.ImageFormat]
+
+
+class RerunRecording(ABC):
+    """Mixin that logs episodes to Rerun, used by :class:`RenderRerun` and :class:`RenderRerunVector`.
+
+    The wrappers keep track of their episodes and frames, and hand the logged rows over to
+    :meth:`send_rows`, the markers to :meth:`log_markers` and the rendered frames to :meth:`queue_frame`.
+    They call :meth:`start_recording` at the end of their ``__init__``, and implement :meth:`send_batch`.
+    """
+
+    __slots__ = (
+        "viewer", "skip_episodes", "_log_all", "batch_size", "memory_limit", "flush_every", "_unflushed",
+        "_numeric_actions", "rec", "recs", "viewer_rec", "jpeg_quality", "_tj", "_frame_queue", "_dropped",
+        "_dropped_paths", "_dropped_frame", "_dropped_reported", "_frame_batches", "_pending_frames", "_planar_buffer",
+        "_encoder_thread", "episode_names", "tabs", "_blueprint_dirty", "_stopped", "_exit_hook",
+    )
+
+    # The episode markers never change, so they're built once and shared by all instances.
+    _DONE_LOG = rr.TextLog("DONE!")
+    _TRUNC_LOG = rr.TextLog("Interrupted")
+
+
+    def start_recording(
+        self,
+        *,
+        render_mode: str | None,
+        filename: str | None,
+        viewer: Literal["script", "notebook", False] | None,
+        skip_episodes: int,
+        flush_every: int,
+        max_queued_frames: int,
+        batch_size: int,
+        action_space: spaces.Space,
+        jpeg_quality: int | None,
+        memory_limit: str,
+    ) -> None:
+        """Checks the wrapper's arguments, creates the recording streams and starts the encoder thread.
+
+        The arguments are described in :class:`RenderRerun`.
+        """
+        # Explicit checks instead of asserts, so they're not stripped when running with python -O.
+        name = type(self).__name__
+        if render_mode is None:
+            raise ValueError(f"{name} requires an environment with a render_mode, e.g. render_mode=\"rgb_array\".")
+        if render_mode.endswith("_list"):
+            raise ValueError(f"{name} collects the frames itself, render_mode=\"{render_mode}\" is not supported.")
+        if viewer not in ("script", "notebook", False, None):
+            raise ValueError(f"viewer must be \"script\", \"notebook\", False or None, got {viewer!r}.")
+
+        self.viewer = viewer
+        self.skip_episodes = skip_episodes
+        self._log_all = skip_episodes in (0, 1)
+        self.batch_size = max(batch_size, 1)
+        self.memory_limit = memory_limit
+        self.flush_every = flush_every
+        self._unflushed = 0
+        self._numeric_actions = isinstance(action_space, NUMERIC_ACTION_SPACES)
+
+        # A single RecordingStream tees every log call to the file and the native viewer.
+        self.rec = rr.RecordingStream(application_id="rerun_wrapper")
+        self.recs: list[rr.RecordingStream] = [self.rec]
+
+        sinks = []
+        if filename:
+            sinks.append(rr.FileSink(filename))
+
+        # The notebook viewer replaces the sinks of its stream, so it only gets a stream of its own when saving to a file.
+        self.viewer_rec = self.rec
+        if self.viewer == "notebook" and filename:
+            self.viewer_rec = rr.RecordingStream(application_id="rerun_wrapper")
+            self.recs.append(self.viewer_rec)
+
+        if self.viewer:
+            self.show_viewer()
+
+        if self.viewer == "script":
+            sinks.append(rr.GrpcSink())
+
+        if sinks:
+            self.rec.set_sinks(*sinks)
+
+        self.start_blueprint()
+
+        # Frames are compressed and logged by a background thread, libjpeg releases the GIL while encoding.
+        self.jpeg_quality = jpeg_quality
+        self._tj = load_turbojpeg() if jpeg_quality is not None else None
+        self._frame_queue: queue.Queue = queue.Queue(maxsize=max(max_queued_frames, 1))
+        self._dropped = 0
+        self._dropped_paths: dict[str, str] | None = None
+        self._dropped_frame = 0
+        self._dropped_reported = time.monotonic()
+        self._frame_batches: dict[str, list[tuple[int, EncodedFrame]]] = {}
+        self._pending_frames = 0
+        self._planar_buffer: np.ndarray | None = None
+
+        # The thread and the exit hook only hold weak references, so a wrapper that isn't closed can still be collected.
+        self._encoder_thread = threading.Thread(
+            target=_run_encoder, args=(weakref.ref(self), self._frame_queue), name="rerun_encoder", daemon=True
+        )
+        self._encoder_thread.start()
+
+        # The batched rows and pending frames are also sent when the interpreter exits without close().
+        self._stopped = False
+        self._exit_hook = partial(_stop_at_exit, weakref.ref(self))
+        atexit.register(self._exit_hook)
+
+
+    def show_viewer(self) -> None:
+        """Spawns the native viewer or displays the viewer in a Jupyter Notebook."""
+        # The native viewer is only spawned here, the recording stream connects to it through its gRPC sink.
+        if self.viewer == "script":
+            self.viewer_rec.spawn(connect=False, memory_limit=self.memory_limit)
+        elif self.viewer == "notebook":
+            self.viewer_rec.notebook_show()
+
+
+    def action_row(self, action: Any) -> np.ndarray | str:
+        """Flattens a numeric action to the values of its scalar plot, other actions are formatted as text."""
+        if self._numeric_actions:
+            return np.asarray(action, dtype=np.float64).ravel()
+
+        return format_action(action)
+
+
+    def send_rows(self, paths: dict[str, str], rows: list[tuple[int, float, np.ndarray | str]]) -> None:
+        """Sends the batched (frame, reward, action) rows as columns, one call per entity path, and clears them."""
+        if not rows:
+            return
+
+        frames, rewards, actions = zip(*rows)
+        rows.clear()
+
+        indexes = [rr.TimeColumn("frame", sequence=frames)]
+        if self._numeric_actions:
+            action_columns = rr.Scalars.columns(scalars=np.stack(actions))
+        else:
+            action_columns = rr.TextLog.columns(text=actions)
+
+        for s in self.recs:
+            s.send_columns(paths["reward"], indexes=indexes, columns=rr.Scalars.columns(scalars=rewards))
+            s.send_columns(paths["action"], indexes=indexes, columns=action_columns)
+
+
+    def log_markers(self, paths: dict[str, str], frame_idx: int, done: bool, truncated: bool) -> None:
+        """Logs the end of an episode, the markers are rare so they're logged directly instead of batched."""
+        for s in self.recs:
+            s.set_time("frame", sequence=frame_idx)
+
+            if done:
+                s.log(paths["done"], self._DONE_LOG)
+
+            if truncated:
+                s.log(paths["interrupted"], self._TRUNC_LOG)
+
+
+    def queue_frame(self, item: tuple[dict[str, str], int, RenderFrame]) -> None:
+        """Hands a frame over to the encoder thread, dropping the oldest queued frame when full.
+
+        Only frames are dropped, the rewards and actions are cheap and always logged. The number of dropped frames is
+        logged as a warning at most every ``DROPPED_REPORT_INTERVAL`` seconds.
+        """
+        if self._put_frame_queue(item) and time.monotonic() - self._dropped_reported >= DROPPED_REPORT_INTERVAL:
+            self.report_dropped()
+
+
+    def _put_frame_queue(self, item: tuple[dict[str, str], int, RenderFrame] | str) -> bool:
+        """Puts a frame or ``FLUSH_FRAMES`` in the frame queue, dropping the oldest item when full.
+
+        Returns whether a frame was dropped.
+        """
+        try:
+            self._frame_queue.put_nowait(item)
+            return False
+        except queue.Full:
+            try:
+                dropped = self._frame_queue.get_nowait()
+            except queue.Empty:
+                dropped = None
+            self._frame_queue.put_nowait(item)
+
+            if not isinstance(dropped, tuple):
+                return False
+
+            self._dropped += 1
+            self._dropped_paths, self._dropped_frame = dropped[:2]
+            return True
+
+
+    def report_dropped(self) -> None:
+        """Logs how many frames were dropped since the last report, to the episode and at the frame of the last drop."""
+        if not self._dropped:
+            return
+
+        self.log_warning(
+            self._dropped_paths["warnings"],
+            self._dropped_frame,
+            f"Dropped {self._dropped} frames, the encoder can't keep up with the environment",
+        )
+
+        self._dropped = 0
+        self._dropped_reported = time.monotonic()
+
+
+    def encode_frame(self, item: tuple[dict[str, str], int, RenderFrame] | str | None) -> None:
+        """Compresses a queued frame in the encoder thread, sending the compressed frames in columnar batches.
+
+        The frames are grouped by entity path, since the sub-environments of a vector environment interleave. They're
+        sent once ``batch_size`` frames are pending, or when the item isn't a frame: ``FLUSH_FRAMES`` at the end of an
+        episode or when no frame arrived for ``FRAME_BATCH_TIMEOUT`` seconds, and ``None`` when the recording stops.
+        """
+        if isinstance(item, tuple):
+            paths, frame_idx, frame = item
+
+            # A frame that can't be encoded is skipped with a warning, the thread keeps encoding the next frames.
+            try:
+                # Planar frames are converted into one slot per pending frame, the buffer is reused once they're sent.
+                out = None
+                if self.jpeg_quality is None and cv2 is not None and frame.ndim == 3:
+                    shape = (self.batch_size, frame.shape[0] * 3 // 2, frame.shape[1])
+                    if self._planar_buffer is None or self._planar_buffer.shape != shape:
+                        self._planar_buffer = np.empty(shape, dtype=np.uint8)
+                    out = self._planar_buffer[self._pending_frames]
+
+                encoded = self.compress(frame, out)
+            except Exception as e:
+                self.log_warning(paths["warnings"], frame_idx, f"Frame {frame_idx} couldn't be encoded and was skipped: {e!r}")
+            else:
+                self._frame_batches.setdefault(paths["frames"], []).append((frame_idx, encoded))
+                self._pending_frames += 1
+
+        if not isinstance(item, tuple) or self._pending_frames >= self.batch_size:
+            for frames_path, batch in self._frame_batches.items():
+                self.send_frames(frames_path, batch)
+
+            self._frame_batches.clear()
+            self._pending_frames = 0
+
+
+    def log_warning(self, path: str, frame_idx: int, text: str) -> None:
+        """Logs a warning to all recording streams at the given frame."""
+        message = rr.TextLog(text, level=rr.TextLogLevel.WARN)
+        for s in self.recs:
+            s.set_time("frame", sequence=frame_idx)
+            s.log(path, message)
+
+
+    def send_frames(self, frames_path: str, batch: list[tuple[int, EncodedFrame]]) -> None:
+        """Sends the compressed frames as columns, one call for the JPEG and one for the uncompressed frames."""
+        if not batch:
+            return
+
+        jpegs = [(idx, f) for idx, f in batch if isinstance(f, bytes)]
+        raws = [(idx, f) for idx, f in batch if not isinstance(f, bytes)]
+        batch.clear()
+
+        for s in self.recs:
+            if jpegs:
+                frames, blobs = zip(*jpegs)
+                s.send_columns(
+                    frames_path,
+                    indexes=[rr.TimeColumn("frame", sequence=frames)],
+                    columns=rr.EncodedImage.columns(blob=blobs, media_type=["image/jpeg"] * len(blobs)),
+                )
+
+            if raws:
+                frames, images = zip(*raws)
+                buffers, formats = zip(*images)
+                s.send_columns(
+                    frames_path,
+                    indexes=[rr.TimeColumn("frame", sequence=frames)],
+                    # The buffers are reinterpreted as bytes like rr.Image does, instead of casting their values to uint8.
+                    columns=rr.Image.columns(buffer=[b.view(np.uint8).reshape(-1) for b in buffers], format=formats),
+                )
+
+
+    def compress(self, frame: RenderFrame, out: np.ndarray | None = None) -> EncodedFrame:
+        """Compresses an RGB frame to JPEG, using libjpeg-turbo when it's available.
+
+        Uncompressed frames are converted into ``out`` when it's given, see :func:`planar_image`.
+        """
+        if self.jpeg_quality is None:
+            return planar_image(frame, out)
+
+        if frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[2] != 3:
+            return raw_image(frame)
+
+        if self._tj is not None:
+            return self._tj.encode(frame, quality=self.jpeg_quality, pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+
+        output = BytesIO()
+        PILImage.fromarray(frame).save(output, format="JPEG", quality=self.jpeg_quality)
+        return output.getvalue()
+
+
+    def count_logged(self, ended: bool) -> None:
+        """Lets Rerun batch the logs, only draining periodically or when an episode ends."""
+        self._unflushed += 1
+        if ended:
+            self._put_frame_queue(FLUSH_FRAMES)
+
+        if ended or self._unflushed >= self.flush_every:
+            self.flush(blocking=False)
+
+
+    def flush(self, blocking: bool = True) -> None:
+        """Flushes all recording streams."""
+        for s in self.recs:
+            s.flush(blocking=blocking)
+
+        self._unflushed = 0
+
+
+    def is_logged(self, episode: int) -> bool:
+        """Whether the episode is saved or skipped according to ``skip_episodes``."""
+        return self._log_all or episode % self.skip_episodes == 1
+
+
+    def start_blueprint(self):
+        self.episode_names = set()
+        self.tabs = []
+        self._blueprint_dirty = False
+
+
+    def update_blueprint(self, episode_name):
+        """Adds a tab for a new logged episode, the blueprint is only rebuilt by :meth:`send_blueprint`."""
+        if episode_name not in self.episode_names:
+            self.episode_names.add(episode_name)
+            self.tabs.append(
+                rrb.Horizontal(
+                            contents= [
+                                rrb.Spatial2DView(
+                                    name="frames",
+                                    origin=f"/{episode_name}/frames"
+                                )
+                            ] +
+                            [
+                                rrb.Vertical(contents=[
+                                    rrb.TimeSeriesView(
+                                        name="action",
+                                        origin=f"/{episode_name}/action")
+                                    if self._numeric_actions else
+                                    rrb.TextLogView(
+                                        name="action",
+                                        origin=f"/{episode_name}/action"),
+                                    rrb.TimeSeriesView(
+                                        name="reward",
+                                        origin=f"/{episode_name}/reward"),
+                                    rrb.TextLogView(
+                                        name="warnings",
+                                        origin=f"/{episode_name}/warnings"),
+                                ])
+                            ],
+                            name=episode_name,
+                        )
+            )
+
+            self._blueprint_dirty = True
+
+
+    def send_blueprint(self):
+        """Rebuilds and sends the blueprint once, after one or more episodes were added."""
+        if not self._blueprint_dirty:
+            return
+
+        blueprint = rrb.Blueprint(
+            rrb.Tabs(
+                contents=self.tabs
+            ),
+            rrb.BlueprintPanel(state="collapsed"),
+            rrb.SelectionPanel(state="collapsed"),
+            rrb.TimePanel(state="expanded"),
+        )
+
+        for s in self.recs:
+            s.send_blueprint(blueprint)
+
+        self._blueprint_dirty = False
+
+
+    @abstractmethod
+    def send_batch(self) -> None:
+        """Sends the rewards and actions batched by the wrapper."""
+
+
+    def stop_recording(self) -> None:
+        """Sends the batched rows, lets the encoder thread finish the queued frames, then drains any pending logs and disconnects."""
+        # A wrapper whose arguments failed the checks never started recording, but VectorEnv.__del__ still closes it.
+        if getattr(self, "_stopped", True):
+            return
+
+        self._stopped = True
+        atexit.unregister(self._exit_hook)
+
+        self.send_batch()
+
+        if self._encoder_thread.is_alive():
+            self._frame_queue.put(None)
+            self._encoder_thread.join()
+
+        self.report_dropped()
+
+        self.flush()
+
+        for s in self.recs:
+            try:
+                s.disconnect()
+            except Exception:
+                pass
+
+
+def _run_encoder(ref: weakref.ref, frame_queue: queue.Queue) -> None:
+    """Runs the encoder thread until ``None`` is received, or until the recording is garbage collected.
+
+    The recording is only referenced while an item is encoded, not while the thread waits for the next one.
+    """
+    while True:
+        try:
+            item = frame_queue.get(timeout=FRAME_BATCH_TIMEOUT)
+        except queue.Empty:
+            item = FLUSH_FRAMES
+
+        recording = ref()
+        if recording is None:
+            return
+
+        recording.encode_frame(item)
+        del recording
+
+        if item is None:
+            return
+
+
+def _stop_at_exit(ref: weakref.ref) -> None:
+    """Stops a recording that wasn't closed, it's only referenced weakly so the hook doesn't keep it alive."""
+    recording = ref()
+    if recording is not None:
+        recording.stop_recording()
+
+
+def episode_paths(episode_name: str) -> dict[str, str]:
+    """Builds the entity paths of an episode, so they're not formatted on every step."""
+    return {
+        "episode": episode_name,
+        "reward": f"{episode_name}/reward",
+        "action": f"{episode_name}/action",
+        "frames": f"{episode_name}/frames",
+        "done": f"{episode_name}/done",
+        "interrupted": f"{episode_name}/interrupted",
+        "warnings": f"{episode_name}/warnings",
+    }
+
+
+def format_action(action: Any) -> str:
+    """Formats an action for a TextLog, numbers and arrays directly instead of through their repr and numpy's default printer."""
+    if isinstance(action, np.ndarray):
+        return np.array2string(action, max_line_width=10_000, separator=", ", formatter={"float_kind": _fmt_float})
+
+    if isinstance(action, (float, np.floating)):
+        return f"{float(action):.6g}"
+
+    if isinstance(action, tuple):
+        return "(" + ", ".join(format_action(v) for v in action) + ")"
+
+    if isinstance(action, dict):
+        return "{" + ", ".join(f"{k}: {format_action(v)}" for k, v in action.items()) + "}"
+
+    return str(action)
+
+
+def _fmt_float(value: float) -> str:
+    """Formats an array element without padding it to the width of the other elements."""
+    return f"{value:.4g}"
+
+
+def load_turbojpeg() -> "TurboJPEG | None":
+    """Returns a TurboJPEG encoder, or None if PyTurboJPEG or the libjpeg-turbo library are not installed."""
+    if TurboJPEG is None:
+        return None
+
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError):
+        return None
+
+
+def planar_image(frame: RenderFrame, out: np.ndarray | None = None) -> tuple[np.ndarray, rr.components.ImageFormat]:
+    """Converts an RGB frame to planar YUV 4:2:0 when OpenCV is installed, half the size of the RGB frame.
+
+    The chroma planes are subsampled, frames that can't be (no OpenCV, odd sizes or not RGB) are logged as they are.
+    The conversion is written into ``out`` when it's a preallocated ``(height * 3 // 2, width)`` uint8 array.
+    """
+    if cv2 is None or frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[2] != 3 or frame.shape[0] % 2 or frame.shape[1] % 2:
+        return raw_image(frame)
+
+    height, width = frame.shape[:2]
+    if out is not None and out.shape == (height * 3 // 2, width):
+        yuv = cv2.cvtColor(frame, cv2.COLOR_RGB2YUV_I420, dst=out)
+    else:
+        yuv = cv2.cvtColor(frame, cv2.COLOR_RGB2YUV_I420)
+    return yuv, rr.components.ImageFormat(width=width, height=height, pixel_format=rr.PixelFormat.Y_U_V12_LimitedRange)
+
+
+def raw_image(frame: RenderFrame) -> tuple[np.ndarray, rr.components.ImageFormat]:
+    """Returns the frame with the image format of its shape, grayscale, RGB or RGBA."""
+    color_model = "L" if frame.ndim == 2 else {1: "L", 3: "RGB", 4: "RGBA"}[frame.shape[2]]
+    image_format = rr.components.ImageFormat(
+        width=frame.shape[1],
+        height=frame.shape[0],
+        color_model=color_model,
+        channel_datatype=rr.datatypes.ChannelDatatype.from_np_dtype(frame.dtype),
+    )
+    return frame, image_format
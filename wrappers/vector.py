@@ -0,0 +1,221 @@
+"""A vector environment version of RenderRerun, each sub-environment is recorded to its own entity path.
+
+* ``RenderRerunVector`` - Collects rendered frames of every sub-environment into Rerun
+"""
+
+
+from typing import Any, Literal
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium.core import ActType, ObsType, RenderFrame
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import iterate
+
+from wrappers.recording import RerunRecording, episode_paths
+
+
+__all__ = [
+    "RenderRerunVector",
+]
+
+
+class RenderRerunVector(
+    gym.vector.VectorWrapper,
+    gym.utils.RecordConstructorArgs,
+    RerunRecording,
+):
+    """Collect rendered frames of a vector environment such each ``step`` of every sub-environment is saved to Rerun.
+
+    Sub-environment ``i`` is logged to ``env{i}/episode{n}``, and its episodes are counted separately
+    as the vector environment resets them.
+
+    Example - Add the RenderRerunVector wrapper and save data to file.
+        >>> import gymnasium as gym
+        >>> from wrappers import RenderRerunVector
+        >>> envs = gym.make_vec("LunarLander-v3", num_envs=4, vectorization_mode="sync", render_mode="rgb_array")
+        >>> envs = RenderRerunVector(envs, filename="example.rrd", skip_episodes=0)
+        >>> _ = envs.reset(seed=123)
+        >>> for _ in range(5):
+        ...     _ = envs.step(envs.action_space.sample())
+        ...
+        >>> envs.close()
+    Open the .rrd file by running `rerun example.rrd` in a terminal.
+
+    """
+
+    # Slots for the attributes used on every step, gym.vector.VectorWrapper still provides a __dict__ for the rest.
+    __slots__ = (
+        "autoreset_mode", "_autoreset", "episodes", "frames", "_paths", "_batches", "image_every",
+    )
+
+    def __init__(
+        self,
+        env: gym.vector.VectorEnv,
+        filename: str | None = None,
+        skip_episodes: int = 100,
+        viewer: Literal["script", "notebook", False] | None = False,
+        flush_every: int = 64,
+        image_every: int = 1,
+        max_queued_frames: int = 32,
+        batch_size: int = 32,
+        jpeg_quality: int | None = 95,
+        memory_limit: str = "75%",
+    ):
+        """Initialize a :class:`RenderRerunVector` instance.
+
+        Args:
+            env: The vector environment that is being wrapped
+            filename, skip_episodes, viewer, flush_every, image_every, max_queued_frames, batch_size, jpeg_quality, memory_limit:
+                The same as :class:`RenderRerun`, except that episodes are counted and rows are batched per sub-environment.
+        """
+        gym.vector.VectorWrapper.__init__(self, env)
+
+        self.autoreset_mode = AutoresetMode(env.metadata.get("autoreset_mode", AutoresetMode.NEXT_STEP))
+        self._autoreset = np.zeros(self.num_envs, dtype=np.bool_)
+
+        self.episodes = [0] * self.num_envs
+        self.frames = [0] * self.num_envs
+        self._paths = [episode_paths(f"env{i}/episode00000") for i in range(self.num_envs)]
+        self._batches: list[list[tuple[int, float, np.ndarray | str]]] = [[] for _ in range(self.num_envs)]
+        self.image_every = max(image_every, 1)
+
+        self.start_recording(
+            render_mode=env.render_mode,
+            filename=filename,
+            viewer=viewer,
+            skip_episodes=skip_episodes,
+            flush_every=flush_every,
+            max_queued_frames=max_queued_frames,
+            batch_size=batch_size,
+            action_space=env.single_action_space,
+            jpeg_quality=jpeg_quality,
+            memory_limit=memory_limit,
+        )
+
+
+    @property
+    def render_mode(self):
+        """Returns the collection render_mode name."""
+        return f"{self.env.render_mode}_rerun"
+
+
+    def step(
+        self, actions: ActType
+    ) -> tuple[ObsType, np.ndarray, np.ndarray, np.ndarray, dict[str, Any]]:
+        """Perform a step in the base vector environment and collect a frame of every logged sub-environment."""
+        output = self.env.step(actions)
+        _, rewards, terminations, truncations, _ = output
+
+        # Sub-environments that are autoresetting in this step start a new episode instead of being logged.
+        logged = [
+            not self._autoreset[i] and (self._log_all or self.episodes[i] % self.skip_episodes == 1)
+            for i in range(self.num_envs)
+        ]
+
+        # All sub-environments are rendered in one call, only when a logged one needs its frame.
+        renders = None
+        if any(logged[i] and self.frames[i] % self.image_every == 0 for i in range(self.num_envs)):
+            renders = self.env.call("render")
+
+        for i, action in enumerate(iterate(self.env.action_space, actions)):
+            if self._autoreset[i]:
+                self.new_episode(i)
+                continue
+
+            if logged[i]:
+                frame = renders[i] if renders is not None and self.frames[i] % self.image_every == 0 else None
+                self.logger(i, rewards[i], terminations[i], truncations[i], action, frame)
+
+            self.frames[i] += 1
+
+        ended = np.logical_or(terminations, truncations)
+        if self.autoreset_mode == AutoresetMode.NEXT_STEP:
+            self._autoreset = ended
+        elif self.autoreset_mode == AutoresetMode.SAME_STEP:
+            for i in np.flatnonzero(ended):
+                self.new_episode(i)
+
+        self.send_blueprint()
+
+        return output
+
+
+    def reset(
+        self, *, seed: int | list[int] | None = None, options: dict[str, Any] | None = None
+    ) -> tuple[ObsType, dict[str, Any]]:
+        """Reset the base vector environment, move the reset sub-environments to their next episode."""
+        # The vector environment pops reset_mask from the options, so it's read before the reset.
+        reset_mask = (options or {}).get("reset_mask")
+        output = self.env.reset(seed=seed, options=options)
+
+        for i in range(self.num_envs):
+            if reset_mask is None or reset_mask[i]:
+                self.new_episode(i)
+                self._autoreset[i] = False
+
+        self.send_blueprint()
+
+        return output
+
+
+    def new_episode(self, i: int) -> None:
+        """Sends the batch of the sub-environment, then moves it to the next episode and resets its frames."""
+        self.send_rows(self._paths[i], self._batches[i])
+
+        self.episodes[i] += 1
+        self.frames[i] = 0
+        self._paths[i] = episode_paths(f"env{i}/episode{self.episodes[i]:05}")
+
+        # The tab is added here, the blueprint is sent once for all the sub-environments at the end of the step or reset.
+        if self.is_logged(self.episodes[i]):
+            self.update_blueprint(self._paths[i]["episode"])
+
+
+    def render(self) -> None:
+        """Displays the Rerun viewer in a Jupyter Notebook."""
+        self.show_viewer()
+
+        return None
+
+
+    def logger(
+        self,
+        i: int,
+        reward: float,
+        done: bool,
+        truncated: bool,
+        action: ActType,
+        frame: RenderFrame | None = None,
+    ) -> None:
+        """Logs the step of sub-environment ``i`` to Rerun, the rendered ``frame`` is only logged when given."""
+        paths = self._paths[i]
+        batch = self._batches[i]
+        frame_idx = self.frames[i]
+
+        batch.append((frame_idx, float(reward), self.action_row(action)))
+
+        if done or truncated:
+            self.log_markers(paths, frame_idx, done, truncated)
+
+        if frame is not None:
+            self.queue_frame((paths, frame_idx, frame))
+
+        if done or truncated or len(batch) >= self.batch_size:
+            self.send_rows(paths, batch)
+
+        self.count_logged(done or truncated)
+
+
+    def send_batch(self) -> None:
+        """Sends the batched rewards and actions of every sub-environment."""
+        for paths, batch in zip(self._paths, self._batches):
+            self.send_rows(paths, batch)
+
+
+    def close(self, **kwargs: Any):
+        """Disconnects Rerun and closes the wrapped vector environment."""
+        self.stop_recording()
+
+        return super().close(**kwargs)